@@ -1,55 +1,184 @@
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import aiohttp
+import yarl
+import asyncio
+import websockets
+import orjson
 import time
 import hmac
 import hashlib
-from decimal import Decimal, getcontext
+from urllib.parse import urlencode, urlsplit
+import math
+import os
+import numpy as np
+from decimal import Decimal, ROUND_DOWN, getcontext, localcontext
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    # numba is optional, scan_surface_rates falls back to plain NumPy without it
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        return lambda func: func
 
 # Set decimal precision
 getcontext().prec = 10
 
+# One row per triangle: the three legs' market indices and the forward / reverse topology codes
+TRIANGLE_DTYPE = np.dtype([('ia', 'i4'), ('ib', 'i4'), ('ic', 'i4'), ('topo_f', 'u1'), ('topo_r', 'u1')])
+
+@njit(cache=True, parallel=True)
+def _score_all(ask, bid, triangles, fee_factor, out):
+    for t in prange(triangles.shape[0]):
+        tri = triangles[t]
+        legs = (tri.ia, tri.ib, tri.ic)
+        for d in range(2):
+            topo = tri.topo_f if d == 0 else tri.topo_r
+            rate = 1.0
+            for leg in range(3):
+                i = legs[leg]
+                if (topo >> leg) & 1:
+                    rate *= 1.0 / ask[i] if ask[i] != 0.0 else np.inf
+                else:
+                    rate *= bid[i]
+            out[t, d] = rate * fee_factor - 1.0
+
+def _score_numpy(inv_ask, bid, triangles, fee_factor, out):
+    out.fill(fee_factor)
+    for leg, field in enumerate(('ia', 'ib', 'ic')):
+        market = triangles[field]
+        for d, topo in enumerate(('topo_f', 'topo_r')):
+            buy_at_ask = ((triangles[topo] >> leg) & 1).astype(bool)
+            out[:, d] *= np.where(buy_at_ask, inv_ask[market], bid[market])
+    out -= 1.0
+
+def _leg_flips(key):
+    # Walk the forward cycle a -> b -> c. Holding a leg's base means selling it at the bid,
+    # holding its quote means buying the base at the ask. Bit i is set when leg i is bought at the ask.
+    # a_base == b_quote is implied when a_base carries on into pair_b and is not b_base, so the key omits it
+    a_quote_is_b_base, a_quote_is_b_quote = key & 16, key & 8
+    a_base_is_b_base = key & 4
+    b_base_is_c_base, b_quote_is_c_base = key & 2, key & 1
+
+    if a_quote_is_b_base or a_quote_is_b_quote:
+        # Start on a_base, sell it for a_quote, which carries on into pair_b
+        flips, held_is_b_base = 0b000, a_quote_is_b_base
+    else:
+        # Start on a_quote, buy a_base, which carries on into pair_b
+        flips, held_is_b_base = 0b001, a_base_is_b_base
+
+    if held_is_b_base:
+        held_is_c_base = b_quote_is_c_base
+    else:
+        flips |= 0b010
+        held_is_c_base = b_base_is_c_base
+
+    if not held_is_c_base:
+        flips |= 0b100
+    return flips
+
+# Leg flips per direction for every 5-bit equality pattern produced by topology_key.
+# The reverse direction walks the same cycle backwards, so every leg trades on the opposite side.
+TOPO_TABLE = np.array([[_leg_flips(key) for key in range(32)], [_leg_flips(key) ^ 0b111 for key in range(32)]],
+                      dtype=np.uint8)
+
+# Seconds a saved triangle calibration stays valid before it is redone
+CALIBRATION_MAX_AGE = 24 * 60 * 60
+
 class BitvavoAPIError(Exception):
     pass
 
 class BitvavoTrader:
-    def __init__(self, api_key, api_secret, trading_fee=Decimal('0.002')):
+    def __init__(self, api_key, api_secret, trading_fee=0.002):
         self.api_key = api_key
         self.api_secret = api_secret
+        # Keyed once; generate_signature copies it instead of re-deriving the key pads
+        self._hmac_template = hmac.new(self.api_secret.encode('utf-8'), b'', hashlib.sha256)
         self.base_url = 'https://api.bitvavo.com/v2'
+        # Bitvavo signs the full request path, so the /v2 prefix is part of the signed message
+        self._base_path = urlsplit(self.base_url).path
+        self.ws_url = 'wss://ws.bitvavo.com/v2/'
         self.headers = {
             'Content-Type': 'application/json',
             'Bitvavo-Access-Key': self.api_key,
             'Bitvavo-Access-Window': '10000'
         }
-        self.trading_fee = trading_fee
+        # One pooled keep-alive session so TLS setup is paid once, not per request
+        self._session = requests.Session()
+        self._session.headers.update(self.headers)
+        retries = Retry(total=3, backoff_factor=0.2, status_forcelist=(429, 500, 502, 503, 504))
+        self._session.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=retries))
+        self.trading_fee = float(trading_fee)
+        # Every triangle pays the fee on all three swaps
+        self._one_minus_fee_cubed = (1.0 - self.trading_fee) ** 3
+        # Keep concurrent requests well inside Bitvavo's rate limit weight
+        self.request_semaphore = asyncio.Semaphore(10)
         self.amount_dict = self.get_account_balance()
         self.market_data = self.get_symbol_details()
+        self.market_to_idx = {x['market']: i for i, x in enumerate(self.market_data)}
+        # Live best ask/bid per market, written in place by subscribe_tickers
+        self._ask, self._bid = self.price_arrays([])
+        # False while the ticker stream is down or not yet re-seeded, the live arrays are stale then
+        self.ticker_connected = False
         self.inc_list = {x['market']: x['baseIncrement'] for x in self.market_data}
         self.qinc_list = {x['market']: x['quoteIncrement'] for x in self.market_data}
 
     def generate_signature(self, timestamp, method, endpoint, body=''):
-        message = timestamp + method + endpoint + body
-        signature = hmac.new(self.api_secret.encode('utf-8'), message.encode('utf-8'), hashlib.sha256).hexdigest()
-        return signature
+        signature = self._hmac_template.copy()
+        signature.update(f"{timestamp}{method}{endpoint}{body}".encode('utf-8'))
+        return signature.hexdigest()
+
+    def canonical_endpoint(self, endpoint, params=None):
+        # The query string is part of the signed message, so the URL must carry exactly the signed form
+        if params:
+            return f"{endpoint}?{urlencode(sorted(params.items()))}"
+        return endpoint
 
     def bitvavo_request(self, endpoint, method='GET', params=None):
+        endpoint = self.canonical_endpoint(endpoint, params)
         timestamp = str(int(time.time() * 1000))
-        signature = self.generate_signature(timestamp, method, endpoint)
-        self.headers['Bitvavo-Access-Signature'] = signature
-        self.headers['Bitvavo-Access-Timestamp'] = timestamp
-
-        url = f"{self.base_url}{endpoint}"
-        if params:
-            url += '?' + '&'.join([f"{key}={requests.utils.quote(value)}" for key, value in params.items()])
+        signature = self.generate_signature(timestamp, method, f"{self._base_path}{endpoint}")
+        headers = {
+            'Bitvavo-Access-Signature': signature,
+            'Bitvavo-Access-Timestamp': timestamp
+        }
 
         try:
-            response = requests.request(method, url, headers=self.headers)
+            response = self._session.request(method, f"{self.base_url}{endpoint}", headers=headers)
             response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            return orjson.loads(response.content)
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
             print(f"API request failed: {e}")
             raise BitvavoAPIError(f"API request failed: {e}")
 
+    def client_session(self):
+        connector = aiohttp.TCPConnector(limit=32, keepalive_timeout=30)
+        return aiohttp.ClientSession(connector=connector)
+
+    async def _request_async(self, session, endpoint, method='GET', params=None):
+        endpoint = self.canonical_endpoint(endpoint, params)
+
+        async with self.request_semaphore:
+            # Sign only once a slot is free, queued requests would otherwise age past Bitvavo-Access-Window
+            timestamp = str(int(time.time() * 1000))
+            headers = dict(self.headers)
+            headers['Bitvavo-Access-Signature'] = self.generate_signature(timestamp, method, f"{self._base_path}{endpoint}")
+            headers['Bitvavo-Access-Timestamp'] = timestamp
+            try:
+                # encoded=True stops yarl from unquoting e.g. %2C and %3A, which would no longer match the signature
+                url = yarl.URL(f"{self.base_url}{endpoint}", encoded=True)
+                async with session.request(method, url, headers=headers) as response:
+                    response.raise_for_status()
+                    return orjson.loads(await response.read())
+            except (aiohttp.ClientError, orjson.JSONDecodeError) as e:
+                print(f"API request failed: {e}")
+                raise BitvavoAPIError(f"API request failed: {e}")
+
     def get_account_balance(self):
         endpoint = '/balance'
         response = self.bitvavo_request(endpoint)
@@ -67,186 +196,279 @@ class BitvavoTrader:
         endpoint = f'/orderbook/{symbol}'
         return self.bitvavo_request(endpoint)
 
+    async def get_orderbooks(self, symbols, session=None):
+        if session is None:
+            async with self.client_session() as session:
+                return await self.get_orderbooks(symbols, session)
+        return await asyncio.gather(*[self._request_async(session, f'/orderbook/{m}') for m in symbols], return_exceptions=True)
+
+    def collect_best_prices(self, orderbooks):
+        best_prices = []
+        for book in orderbooks:
+            if isinstance(book, Exception) or not book.get('asks') or not book.get('bids'):
+                continue
+            best_prices.append({'market': book['market'], 'ask': book['asks'][0][0], 'bid': book['bids'][0][0]})
+        return best_prices
+
     def collect_tradeables(self, json_obj):
         return [coin['market'] for coin in json_obj]
 
     def structure_triangular_pairs(self, coin_list):
-        triangular_pairs_list = []
-        remove_duplicates_list = []
-        pairs_list = coin_list[:]
-
-        for pair_a in pairs_list:
-            pair_a_split = pair_a.split('-')
-            a_base, a_quote = pair_a_split
-
-            a_pair_box = [a_base, a_quote]
-
-            for pair_b in pairs_list:
-                pair_b_split = pair_b.split('-')
-                b_base, b_quote = pair_b_split
-
-                if pair_b != pair_a:
-                    if b_base in a_pair_box or b_quote in a_pair_box:
-
-                        for pair_c in pairs_list:
-                            pair_c_split = pair_c.split('-')
-                            c_base, c_quote = pair_c_split
-
-                            if pair_c != pair_a and pair_c != pair_b:
-                                combine_all = [pair_a, pair_b, pair_c]
-                                pair_box = [a_base, a_quote, b_base, b_quote, c_base, c_quote]
-                                counts_c_base = pair_box.count(c_base)
-                                counts_c_quote = pair_box.count(c_quote)
-
-                                if counts_c_base == 2 and counts_c_quote == 2 and c_base != c_quote:
-                                    combined = f"{pair_a},{pair_b},{pair_c}"
-                                    unique_item = ''.join(sorted(combine_all))
-                                    if unique_item not in remove_duplicates_list:
-                                        match_dict = {
-                                            "a_base": a_base,
-                                            "b_base": b_base,
-                                            "c_base": c_base,
-                                            "a_quote": a_quote,
-                                            "b_quote": b_quote,
-                                            "c_quote": c_quote,
-                                            "pair_a": pair_a,
-                                            "pair_b": pair_b,
-                                            "pair_c": pair_c,
-                                            "combined": combined
-                                        }
-                                        triangular_pairs_list.append(match_dict)
-                                        remove_duplicates_list.append(unique_item)
+        triangular_pairs_list = list(self.iter_triangular_pairs(coin_list))
+        self.set_active_triangles(triangular_pairs_list)
         return triangular_pairs_list
 
-    def get_price_for_t_pair(self, t_pair, prices_json):
-        pair_a = t_pair['pair_a']
-        pair_b = t_pair['pair_b']
-        pair_c = t_pair['pair_c']
-
-        price_dict = {}
+    def iter_triangular_pairs(self, coin_list):
+        neighbors = {}
+        edge_lookup = {}
+
+        for pair in coin_list:
+            base, quote = pair.split('-')
+            edge = frozenset((base, quote))
+            if base == quote or edge in edge_lookup or pair not in self.market_to_idx:
+                continue
+            edge_lookup[edge] = pair
+            neighbors.setdefault(base, []).append((quote, pair))
+            neighbors.setdefault(quote, []).append((base, pair))
+
+        # Only walk towards higher ranked assets so every triangle is emitted exactly once
+        rank = {asset: i for i, asset in enumerate(sorted(neighbors))}
+
+        for x in sorted(neighbors):
+            nx = [(y, pair) for y, pair in neighbors[x] if rank[y] > rank[x]]
+
+            for i, (y, pair_a) in enumerate(nx):
+                for z, pair_c in nx[i + 1:]:
+                    pair_b = edge_lookup.get(frozenset((y, z)))
+                    if pair_b is None:
+                        continue
+
+                    a_base, a_quote = pair_a.split('-')
+                    b_base, b_quote = pair_b.split('-')
+                    c_base, c_quote = pair_c.split('-')
+                    combined = f"{pair_a},{pair_b},{pair_c}"
+                    match_dict = {
+                        "a_base": a_base,
+                        "b_base": b_base,
+                        "c_base": c_base,
+                        "a_quote": a_quote,
+                        "b_quote": b_quote,
+                        "c_quote": c_quote,
+                        "pair_a": pair_a,
+                        "pair_b": pair_b,
+                        "pair_c": pair_c,
+                        "combined": combined,
+                        "idx": (self.market_to_idx[pair_a], self.market_to_idx[pair_b], self.market_to_idx[pair_c])
+                    }
+                    match_dict['topology'] = (self.determine_topology(match_dict, 'forward'),
+                                              self.determine_topology(match_dict, 'reverse'))
+                    # (market index, market, side) per swap in execution order, resolved once here instead of
+                    # on every price update. Both directions start on pair_a; the reverse then takes pair_c before pair_b.
+                    legs = tuple(zip(match_dict['idx'], (pair_a, pair_b, pair_c)))
+                    for direction, code, order in zip(('forward', 'reverse'), match_dict['topology'], ((0, 1, 2), (0, 2, 1))):
+                        match_dict['plan_' + direction] = tuple(
+                            legs[i] + ('ask' if code >> i & 1 else 'bid',) for i in order)
+                    yield match_dict
+
+    def set_active_triangles(self, triangles):
+        # Struct-of-arrays view consumed by scan_surface_rates, row t belongs to active_triangles[t]
+        self.active_triangles = triangles
+        self.triangles = np.array([t_pair['idx'] + t_pair['topology'] for t_pair in triangles], dtype=TRIANGLE_DTYPE)
+
+    async def sample_price_snapshots(self, session, count, interval):
+        # Ticker snapshots spread over count * interval seconds, for calibrate_triangles
+        snapshots = []
+        for n in range(count):
+            if n:
+                await asyncio.sleep(interval)
+            try:
+                snapshots.append(self.price_arrays(await self._request_async(session, '/ticker/24h')))
+            except BitvavoAPIError:
+                # One failed poll only thins the sample, the other snapshots still calibrate
+                continue
+        return snapshots
+
+    def calibrate_triangles(self, snapshots, ticker_24h, max_gross_deficit=None, min_volume_quote=0.0):
+        # Keep triangles whose rate before fees came within max_gross_deficit (default 2 x fee) of breaking
+        # even on at least one snapshot. The fee drag is the same for every triangle, so it is divided out.
+        if max_gross_deficit is None:
+            max_gross_deficit = 2 * self.trading_fee
+        best_rates = np.full(len(self.active_triangles), -np.inf)
+        for ask, bid in snapshots:
+            rates = np.nan_to_num(self.scan_surface_rates(ask, bid), nan=-np.inf)
+            best_rates = np.maximum(best_rates, rates.max(axis=1))
+        gross_rates = (best_rates + 1.0) / self._one_minus_fee_cubed - 1.0
+        keep = gross_rates > -max_gross_deficit
+
+        # and whose every leg trades at least min_volume_quote (in that market's quote asset) per 24h
+        volume = np.zeros(len(self.market_to_idx))
+        for x in ticker_24h:
+            idx = self.market_to_idx.get(x['market'])
+            if idx is not None and x.get('volumeQuote'):
+                volume[idx] = float(x['volumeQuote'])
+        for leg in ('ia', 'ib', 'ic'):
+            keep &= volume[self.triangles[leg]] >= min_volume_quote
+
+        self.set_active_triangles([t_pair for t_pair, k in zip(self.active_triangles, keep) if k])
+        return self.active_triangles
+
+    def triangle_cache_path(self, max_gross_deficit, min_volume_quote, cache_dir='.'):
+        # A calibration only applies to the same markets, fee and thresholds
+        key = f"{','.join(sorted(self.market_to_idx))}|{self.trading_fee!r}|{max_gross_deficit!r}|{min_volume_quote!r}"
+        return os.path.join(cache_dir, f'active_triangles_{hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]}.json')
+
+    def save_active_triangles(self, path):
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps({
+                "calibrated_at": time.time(),
+                "triangles": [t_pair['combined'] for t_pair in self.active_triangles]
+            }))
+
+    def load_active_triangles(self, path, max_age=CALIBRATION_MAX_AGE):
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, 'rb') as f:
+                cached = orjson.loads(f.read())
+            # Market structure drifts, so an old calibration is redone rather than trusted forever
+            if time.time() - cached['calibrated_at'] > max_age:
+                return False
+            survivors = set(cached['triangles'])
+        except (orjson.JSONDecodeError, KeyError, TypeError):
+            # A truncated or foreign cache file just means calibrating again
+            return False
+        self.set_active_triangles([t_pair for t_pair in self.active_triangles if t_pair['combined'] in survivors])
+        return True
+
+    def topology_key(self, t_pair):
+        a_base, a_quote = t_pair['a_base'], t_pair['a_quote']
+        b_base, b_quote = t_pair['b_base'], t_pair['b_quote']
+        c_base = t_pair['c_base']
+        return ((a_quote == b_base) << 4 | (a_quote == b_quote) << 3 | (a_base == b_base) << 2
+                | (b_base == c_base) << 1 | (b_quote == c_base))
+
+    def determine_topology(self, t_pair, direction):
+        return int(TOPO_TABLE[0 if direction == "forward" else 1, self.topology_key(t_pair)])
+
+    def price_arrays(self, prices_json):
+        # Markets without a price get an infinite ask and a zero bid, i.e. a leg rate of zero
+        ask = np.full(len(self.market_to_idx), np.inf)
+        bid = np.zeros(len(self.market_to_idx))
         for x in prices_json:
-            if x['market'] in [pair_a, pair_b, pair_c]:
-                price_dict[x['market'] + '_ask'] = Decimal(x['ask'])
-                price_dict[x['market'] + '_bid'] = Decimal(x['bid'])
-
-        return price_dict
-
-    def safe_divide(self, numerator, denominator):
-        return numerator / denominator if denominator != 0 else Decimal('Infinity')
-
-    def determine_swap_details(self, base, quote, ask, bid, direction):
-        if direction == "forward":
-            return base, quote, self.safe_divide(Decimal('1'), ask), "base_to_quote"
-        else:
-            return quote, base, bid, "quote_to_base"
-
-    def cal_triangular_arb_surface_rate(self, t_pair, prices_dict):
-        starting_amount = Decimal('1')
-        surface_dict = {}
-
+            idx = self.market_to_idx.get(x['market'])
+            if idx is None:
+                continue
+            # /ticker/24h reports null prices for markets with an empty book
+            if x.get('ask'):
+                ask[idx] = float(x['ask'])
+            if x.get('bid'):
+                bid[idx] = float(x['bid'])
+        return ask, bid
+
+    def update_prices(self, ask, bid):
+        # Seed the live arrays from a REST snapshot, subscribe_tickers does so again on every reconnect
+        self._ask, self._bid = ask, bid
+
+    async def subscribe_tickers(self, markets):
+        subscription = orjson.dumps({"action": "subscribe", "channels": [{"name": "ticker", "markets": list(markets)}]})
+        async with self.client_session() as session:
+            while True:
+                try:
+                    async with websockets.connect(self.ws_url) as ws:
+                        await ws.send(subscription.decode('utf-8'))
+                        # Ticks only carry changed fields, so markets that moved while disconnected are re-seeded
+                        # from a REST snapshot once subscribed; later ticks then overwrite it
+                        self.update_prices(*self.price_arrays(await self._request_async(session, '/ticker/book')))
+                        self.ticker_connected = True
+                        async for message in ws:
+                            try:
+                                self._apply_ticker_update(orjson.loads(message))
+                            except ValueError as e:
+                                # Covers orjson.JSONDecodeError and unparsable prices; one bad message isn't worth a reconnect
+                                print(f"Skipping malformed ticker message: {e}")
+                except (websockets.WebSocketException, OSError, BitvavoAPIError) as e:
+                    # WebSocketException also covers handshake rejections such as a 429 or 503 from the server
+                    print(f"Ticker stream dropped: {e}")
+                finally:
+                    self.ticker_connected = False
+                # Also reached when the server closes the stream cleanly; back off before reconnecting
+                await asyncio.sleep(1)
+
+    def _apply_ticker_update(self, update):
+        if not isinstance(update, dict) or update.get('event') != 'ticker':
+            return
+        idx = self.market_to_idx.get(update.get('market'))
+        if idx is None:
+            return
+        # Updates only carry the fields that changed
+        if update.get('bestAsk'):
+            self._ask[idx] = float(update['bestAsk'])
+        if update.get('bestBid'):
+            self._bid[idx] = float(update['bestBid'])
+
+    def scan_live_rates(self):
+        return self.scan_surface_rates(self._ask, self._bid)
+
+    def scan_surface_rates(self, ask, bid):
+        # Arbitrage rates of every active triangle, shape (T, 2) for forward and reverse.
+        # Both directions are always scored: a mispricing that makes one direction profitable is exactly
+        # what drives the other one deeply negative, so a poor forward rate is no reason to skip the reverse.
+        # There is deliberately no process pool here: NumPy is a hard dependency, so the scan is never pure
+        # Python, and the NumPy pass is a few whole-array operations while numba's prange already uses every core.
+        rates = np.empty((len(self.triangles), 2))
+        if NUMBA_AVAILABLE:
+            _score_all(ask, bid, self.triangles, self._one_minus_fee_cubed, rates)
+            return rates
+
+        with np.errstate(divide='ignore'):
+            inv_ask = np.where(ask != 0, 1.0 / ask, np.inf)
+        _score_numpy(inv_ask, bid, self.triangles, self._one_minus_fee_cubed, rates)
+        return rates
+
+    def _quantize_for_order(self, amount, market):
+        # Orders are sized in Decimal, rounded down to the market's base increment. The module-wide
+        # precision of 10 digits is too small for e.g. 1500 at 1e-8, so quantize with room to spare.
+        with localcontext() as ctx:
+            ctx.prec = 38
+            return Decimal(str(amount)).quantize(Decimal(self.inc_list[market]), rounding=ROUND_DOWN)
+
+    def _swap_rate(self, side, idx, ask, bid):
+        if side == 'ask':
+            price = float(ask[idx])
+            return 1.0 / price if price else math.inf
+        return float(bid[idx])
+
+    def _score(self, t_pair, ask, bid):
+        # (forward_rate, reverse_rate) for one triangle, walking the same plans _build_execution_plan uses
+        rates = []
         for direction in ['forward', 'reverse']:
-            a_base, a_quote = t_pair['a_base'], t_pair['a_quote']
-            b_base, b_quote = t_pair['b_base'], t_pair['b_quote']
-            c_base, c_quote = t_pair['c_base'], t_pair['c_quote']
-
-            # First swap
-            swap_1, swap_2, swap_1_rate, direction_trade_1 = self.determine_swap_details(
-                a_base, a_quote, 
-                prices_dict.get(t_pair['pair_a'] + '_ask', Decimal('Infinity')), 
-                prices_dict.get(t_pair['pair_a'] + '_bid', Decimal('0')), 
-                direction
-            )
-
-            acquired_coin_t1 = starting_amount * swap_1_rate * (Decimal('1') - self.trading_fee)
-
-            # Determine second and third swaps
-            if direction == "forward":
-                if a_quote == b_quote:
-                    swap_2_rate = prices_dict.get(t_pair['pair_b'] + '_bid', Decimal('0'))
-                    direction_trade_2 = "quote_to_base"
-                    contract_2 = t_pair['pair_b']
-                    
-                    if b_base == c_base:
-                        swap_3_rate = self.safe_divide(Decimal('1'), prices_dict.get(t_pair['pair_c'] + '_ask', Decimal('Infinity')))
-                        direction_trade_3 = "base_to_quote"
-                        contract_3 = t_pair['pair_c']
-                    else:
-                        swap_3_rate = prices_dict.get(t_pair['pair_c'] + '_bid', Decimal('0'))
-                        direction_trade_3 = "quote_to_base"
-                        contract_3 = t_pair['pair_c']
-                elif a_quote == b_base:
-                    swap_2_rate = self.safe_divide(Decimal('1'), prices_dict.get(t_pair['pair_b'] + '_ask', Decimal('Infinity')))
-                    direction_trade_2 = "base_to_quote"
-                    contract_2 = t_pair['pair_b']
-                    
-                    if b_quote == c_base:
-                        swap_3_rate = self.safe_divide(Decimal('1'), prices_dict.get(t_pair['pair_c'] + '_ask', Decimal('Infinity')))
-                        direction_trade_3 = "base_to_quote"
-                        contract_3 = t_pair['pair_c']
-                    else:
-                        swap_3_rate = prices_dict.get(t_pair['pair_c'] + '_bid', Decimal('0'))
-                        direction_trade_3 = "quote_to_base"
-                        contract_3 = t_pair['pair_c']
-                else:
-                    swap_2_rate = prices_dict.get(t_pair['pair_b'] + '_bid', Decimal('0'))
-                    direction_trade_2 = "quote_to_base"
-                    contract_2 = t_pair['pair_b']
-                    
-                    if b_quote == c_base:
-                        swap_3_rate = self.safe_divide(Decimal('1'), prices_dict.get(t_pair['pair_c'] + '_ask', Decimal('Infinity')))
-                        direction_trade_3 = "base_to_quote"
-                        contract_3 = t_pair['pair_c']
-                    else:
-                        swap_3_rate = prices_dict.get(t_pair['pair_c'] + '_bid', Decimal('0'))
-                        direction_trade_3 = "quote_to_base"
-                        contract_3 = t_pair['pair_c']
-
-            else:  # reverse
-                if a_base == b_base:
-                    swap_2_rate = self.safe_divide(Decimal('1'), prices_dict.get(t_pair['pair_b'] + '_ask', Decimal('Infinity')))
-                    direction_trade_2 = "base_to_quote"
-                    contract_2 = t_pair['pair_b']
-                    
-                    if b_quote == c_quote:
-                        swap_3_rate = prices_dict.get(t_pair['pair_c'] + '_bid', Decimal('0'))
-                        direction_trade_3 = "quote_to_base"
-                        contract_3 = t_pair['pair_c']
-                    else:
-                        swap_3_rate = self.safe_divide(Decimal('1'), prices_dict.get(t_pair['pair_c'] + '_ask', Decimal('Infinity')))
-                        direction_trade_3 = "base_to_quote"
-                        contract_3 = t_pair['pair_c']
-                elif a_base == b_quote:
-                    swap_2_rate = prices_dict.get(t_pair['pair_b'] + '_bid', Decimal('0'))
-                    direction_trade_2 = "quote_to_base"
-                    contract_2 = t_pair['pair_b']
-                    
-                    if b_base == c_quote:
-                        swap_3_rate = prices_dict.get(t_pair['pair_c'] + '_bid', Decimal('0'))
-                        direction_trade_3 = "quote_to_base"
-                        contract_3 = t_pair['pair_c']
-                    else:
-                        swap_3_rate = self.safe_divide(Decimal('1'), prices_dict.get(t_pair['pair_c'] + '_ask', Decimal('Infinity')))
-                        direction_trade_3 = "base_to_quote"
-                        contract_3 = t_pair['pair_c']
-
-            # Calculate final arbitrage rate
-            final_amount = starting_amount
-            for swap_rate in [swap_1_rate, swap_2_rate, swap_3_rate]:
-                final_amount *= swap_rate * (Decimal('1') - self.trading_fee)
-            
-            arbitrage_rate = (final_amount / starting_amount) - Decimal('1')
-
-            surface_dict[direction] = {
-                "swap_1": (swap_1, swap_2, swap_1_rate, direction_trade_1),
-                "swap_2": (contract_2, swap_2_rate, direction_trade_2),
-                "swap_3": (contract_3, swap_3_rate, direction_trade_3),
-                "arbitrage_rate": arbitrage_rate
-            }
+            rate = self._one_minus_fee_cubed
+            for idx, _, side in t_pair['plan_' + direction]:
+                rate *= self._swap_rate(side, idx, ask, bid)
+            rates.append(rate - 1.0)
+        return rates[0], rates[1]
+
+    def _build_execution_plan(self, t_pair, direction, ask, bid):
+        # Per-swap detail for order placement, only materialised for triangles worth trading
+        swaps = []
+        for idx, contract, side in t_pair['plan_' + direction]:
+            direction_trade = "base_to_quote" if side == 'bid' else "quote_to_base"
+            swaps.append((contract, self._swap_rate(side, idx, ask, bid), direction_trade))
+
+        # The first swap always trades pair_a: selling its base at the bid, or buying it at the ask
+        if swaps[0][2] == "base_to_quote":
+            swap_1, swap_2 = t_pair['a_base'], t_pair['a_quote']
+        else:
+            swap_1, swap_2 = t_pair['a_quote'], t_pair['a_base']
 
-        return surface_dict
+        return {
+            "swap_1": (swap_1, swap_2) + swaps[0][1:],
+            "swap_2": swaps[1],
+            "swap_3": swaps[2]
+        }
 
 # Example usage:
-if __name__ == "__main__":
+async def main():
     api_key = "YOUR_API_KEY"
     api_secret = "YOUR_API_SECRET"
     
@@ -261,16 +483,64 @@ if __name__ == "__main__":
     # Structure triangular pairs
     triangular_pairs = trader.structure_triangular_pairs(tradeable_pairs)
     
-    # Calculate arbitrage opportunities
-    for t_pair in triangular_pairs:
-        prices = trader.get_price_for_t_pair(t_pair, market_data)
-        arb_rates = trader.cal_triangular_arb_surface_rate(t_pair, prices)
+    # Calibration settings, part of the cache key so a changed setting forces a fresh calibration
+    max_gross_deficit = 2 * trader.trading_fee
+    min_volume_quote = 0.0
+    calibration_ticks = 12
+    calibration_interval = 10  # seconds, so calibration covers two minutes of prices
+    cache_path = trader.triangle_cache_path(max_gross_deficit, min_volume_quote)
+    
+    # Fetch the orderbooks of every market used by a triangle concurrently
+    markets = sorted({t_pair[leg] for t_pair in triangular_pairs for leg in ('pair_a', 'pair_b', 'pair_c')})
+    async with trader.client_session() as session:
+        orderbooks = await trader.get_orderbooks(markets, session)
+        best_prices = trader.collect_best_prices(orderbooks)
+        
+        # Index the orderbook prices once per snapshot, every triangle then reads them by market index
+        book_prices = trader.price_arrays(best_prices)
         
-        # Print arbitrage opportunities above a certain threshold
-        threshold = Decimal('0.01')  # 1% profit
-        for direction, data in arb_rates.items():
-            if data['arbitrage_rate'] > threshold:
-                print(f"Arbitrage opportunity found: {t_pair['combined']}")
+        # Drop triangles that are structurally out of reach, reusing a recent calibration if there is one
+        if not trader.load_active_triangles(cache_path):
+            snapshots = [book_prices] + await trader.sample_price_snapshots(session, calibration_ticks, calibration_interval)
+            trader.calibrate_triangles(snapshots, market_data, max_gross_deficit, min_volume_quote)
+            trader.save_active_triangles(cache_path)
+    active_triangles = trader.active_triangles
+    
+    trader.update_prices(*book_prices)
+    
+    # Keep prices current from the ticker stream and rescan the active triangles on each pass
+    markets = sorted({t_pair[leg] for t_pair in active_triangles for leg in ('pair_a', 'pair_b', 'pair_c')})
+    ticker_task = asyncio.create_task(trader.subscribe_tickers(markets))
+    threshold = 0.01  # 1% profit
+    try:
+        while True:
+            # Prices freeze once the stream task has died, so stop rather than rescan stale data
+            if ticker_task.done():
+                ticker_task.result()
+                raise RuntimeError("Ticker stream stopped")
+            # While the stream is reconnecting the prices are frozen, so any "opportunity" would be stale
+            if not trader.ticker_connected:
+                await asyncio.sleep(0.5)
+                continue
+            arb_rates = trader.scan_live_rates()
+            
+            # Print arbitrage opportunities above a certain threshold
+            for t, d in zip(*np.nonzero(arb_rates > threshold)):
+                # Re-check the winner through its swap plan, the same legs orders would be placed on
+                rate = trader._score(active_triangles[t], trader._ask, trader._bid)[d]
+                if not rate > threshold:
+                    continue
+                direction = ('forward', 'reverse')[d]
+                plan = trader._build_execution_plan(active_triangles[t], direction, trader._ask, trader._bid)
+                print(f"Arbitrage opportunity found: {active_triangles[t]['combined']}")
                 print(f"Direction: {direction}")
-                print(f"Profit rate: {data['arbitrage_rate']:.2%}")
+                print(f"Profit rate: {rate:.2%}")
+                for swap in ('swap_1', 'swap_2', 'swap_3'):
+                    print(f"{swap}: {plan[swap]}")
                 print("-----")
+            await asyncio.sleep(0.5)
+    finally:
+        ticker_task.cancel()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import index
+
+ASSETS = ['EUR', 'BTC', 'ETH', 'USDC', 'SOL', 'XRP', 'ADA', 'DOT']
+
+def synthetic_markets(seed=7):
+    # Every asset gets a fair EUR price, roughly 60% of asset pairs get a market in a random orientation
+    rng = np.random.default_rng(seed)
+    fair = dict(zip(ASSETS, rng.uniform(0.1, 1000.0, len(ASSETS))))
+    markets = []
+    for x, y in itertools.combinations(ASSETS, 2):
+        if rng.random() < 0.6:
+            base, quote = (x, y) if rng.random() < 0.5 else (y, x)
+            markets.append((f"{base}-{quote}", fair[base] / fair[quote]))
+    return markets
+
+def make_trader(monkeypatch, markets):
+    def fake_request(self, endpoint, method='GET', params=None):
+        if endpoint == '/balance':
+            return [{'symbol': 'EUR', 'available': '10'}]
+        if endpoint == '/markets':
+            return [{'market': m, 'baseIncrement': '0.0001', 'quoteIncrement': '0.01'} for m, _ in markets]
+        raise AssertionError(endpoint)
+    monkeypatch.setattr(index.BitvavoTrader, 'bitvavo_request', fake_request)
+    trader = index.BitvavoTrader('key', 'secret')
+    trader.structure_triangular_pairs([m for m, _ in markets])
+    return trader
+
+def brute_force_triangles(markets):
+    edges = {frozenset(m.split('-')) for m, _ in markets}
+    return sum(1 for x, y, z in itertools.combinations(ASSETS, 3)
+               if {frozenset((x, y)), frozenset((y, z)), frozenset((x, z))} <= edges)
+
+def test_triangle_count_matches_brute_force(monkeypatch):
+    markets = synthetic_markets()
+    trader = make_trader(monkeypatch, markets)
+    assert len(trader.active_triangles) == brute_force_triangles(markets) > 0
+    assert len({t_pair['combined'] for t_pair in trader.active_triangles}) == len(trader.active_triangles)
+
+def test_no_arbitrage_scores_fee_drag_both_ways(monkeypatch):
+    # Ask and bid at the fair price: every cycle multiplies out to 1, so only the three fees remain
+    markets = synthetic_markets()
+    trader = make_trader(monkeypatch, markets)
+    ask, bid = trader.price_arrays([{'market': m, 'ask': p, 'bid': p} for m, p in markets])
+    rates = trader.scan_surface_rates(ask, bid)
+    assert rates.shape == (len(trader.active_triangles), 2)
+    np.testing.assert_allclose(rates, (1.0 - trader.trading_fee) ** 3 - 1.0, atol=1e-12)
+
+def test_plans_chain_back_to_the_start_coin(monkeypatch):
+    # Selling at the bid needs the base in hand and yields the quote, buying at the ask the other way round
+    trader = make_trader(monkeypatch, synthetic_markets())
+    for t_pair in trader.active_triangles:
+        for direction in ('forward', 'reverse'):
+            plan = t_pair['plan_' + direction]
+            assert [market for _, market, _ in plan][0] == t_pair['pair_a']
+            held = start = None
+            for _, market, side in plan:
+                base, quote = market.split('-')
+                give, get = (base, quote) if side == 'bid' else (quote, base)
+                assert held in (None, give)
+                start = give if start is None else start
+                held = get
+            assert held == start
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_scorers_agree(monkeypatch, seed):
+    markets = synthetic_markets()
+    trader = make_trader(monkeypatch, markets)
+    rng = np.random.default_rng(seed)
+    # Fair prices knocked off balance and spread out, so some directions win and some lose
+    mid = np.array([p for _, p in markets]) * rng.uniform(0.97, 1.03, len(markets))
+    spread = rng.uniform(0.0, 0.01, len(markets))
+    ask, bid = trader.price_arrays([{'market': m, 'ask': a, 'bid': b}
+                                    for (m, _), a, b in zip(markets, mid * (1 + spread), mid * (1 - spread))])
+    fee_factor = trader._one_minus_fee_cubed
+
+    numpy_rates = np.empty((len(trader.triangles), 2))
+    index._score_numpy(1.0 / ask, bid, trader.triangles, fee_factor, numpy_rates)
+    scalar_rates = np.array([trader._score(t_pair, ask, bid) for t_pair in trader.active_triangles])
+
+    if index.NUMBA_AVAILABLE:
+        numba_rates = np.empty((len(trader.triangles), 2))
+        index._score_all(ask, bid, trader.triangles, fee_factor, numba_rates)
+        np.testing.assert_allclose(numba_rates, scalar_rates, rtol=1e-12)
+    np.testing.assert_allclose(numpy_rates, scalar_rates, rtol=1e-12)
+    np.testing.assert_allclose(trader.scan_surface_rates(ask, bid), scalar_rates, rtol=1e-12)
+    assert (scalar_rates > 0).any() and (scalar_rates < 0).any()
+
+    # The printed plan multiplies out to the same rate
+    for t_pair, (forward, reverse) in zip(trader.active_triangles, scalar_rates):
+        for direction, rate in (('forward', forward), ('reverse', reverse)):
+            plan = trader._build_execution_plan(t_pair, direction, ask, bid)
+            swap_rates = [plan['swap_1'][2], plan['swap_2'][1], plan['swap_3'][1]]
+            assert np.prod(swap_rates) * fee_factor - 1.0 == pytest.approx(rate, rel=1e-12)